@@ -1,71 +1,252 @@
-from flask import Flask, request, jsonify
-import os, smtplib, json
-import pandas as pd
-import matplotlib.pyplot as plt
+from flask import Flask, request
+from flask.json.provider import JSONProvider
+import os, io, smtplib, threading, functools, hashlib, uuid, time, atexit, queue, logging, logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+import orjson
 from collections import Counter
-from sklearn.preprocessing import LabelEncoder
-from sklearn.cluster import KMeans
-import seaborn as sns
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
-from openai import OpenAI
+from email.message import EmailMessage
+from jinja2 import Template
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson, so jsonify() and request.get_json() skip the stdlib json module."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Log records are queued and written to stderr by a listener thread, so request and job threads
+# never block on the stream.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+logger = logging.getLogger("emma")
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+logger.propagate = False
 
 # --- CRITICAL FIX: Load all credentials from environment variables ---
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD") 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# /analyze hands the whole report pipeline to this pool and returns a task id at once,
+# so no request thread waits on OpenAI, chart rendering or SMTP round-trips.
+executor = ThreadPoolExecutor(max_workers=8)
+# Jobs render their chart here while they wait on OpenAI. It is a separate pool so a job never
+# waits on a task queued behind other jobs, and one worker is enough since _chart_lock serialises renders.
+chart_executor = ThreadPoolExecutor(max_workers=1)
+# Job status lives on disk rather than in memory so any gunicorn worker can answer a poll.
+JOBS_DIR = "output/jobs"
+# output/ is an LRU cache by mtime: older charts and job results past these counts are deleted.
+MAX_CACHED_CHARTS = 256
+MAX_TRACKED_JOBS = 1024
+# A job still pending this long after submission was lost with its worker (restart or kill) and is
+# reported as failed. It covers the OpenAI client's default timeout and retries (3 x 10 min) plus SMTP.
+JOB_DEADLINE_SECONDS = 45 * 60
+# matplotlib is only imported when the first chart is drawn; make sure that never picks a GUI backend.
+os.environ.setdefault("MPLBACKEND", "Agg")
+# The lock serialises access to the shared chart figure, which is not thread-safe.
+_chart_lock = threading.Lock()
+
+# One SMTP connection is kept open and shared by all sends (see send_emails), and recycled
+# after SMTP_MAX_MESSAGES like a pooled client's maxMessages.
+SMTP_MAX_MESSAGES = 100
+# Socket timeout for the SMTP connection, so a half-open connection fails instead of blocking
+# every sender queued on _smtp_lock.
+SMTP_TIMEOUT = 30
+_smtp = None
+_smtp_sent = 0
+_smtp_lock = threading.Lock()
+
+# /analyze payload fields, in unpacking order, with their defaults
+REQUEST_FIELDS = {
+    "daily_logs": [],
+    "camera_moods": [],
+    "guardian_email": "",
+    "clinic_email": "",
+    "user_name": "Your loved one",
+}
+
+# Moods on a rough valence scale, so the "good" cluster is the one with the happier mood mean
+MOOD_ENC = {"Sad": 0, "Anxious": 1, "Neutral": 2, "Calm": 3, "Happy": 4}
+
+MOOD_COLOR = {
+    'Happy': '#4CAF50', 'Calm': '#2196F3', 'Anxious': '#FF9800',
+    'Neutral': '#9E9E9E', 'Sad': '#F44336'
+}
+DEFAULT_COLOR = '#607D8B'
+
+# Below MIN_CLUSTER_ROWS survey logs, suggestions come from each feature's correlation with mood
+MIN_CLUSTER_ROWS = 20
+MIN_MOOD_CORRELATION = 0.5
+
+# Survey features used for clustering, and the suggestion shown when one separates the clusters
+FEATURE_COLS = ["sleep", "water", "exercise", "pain", "energy"]
+MSG_MAP = {
+    "sleep": "• They feel better on <b>{level}</b> sleep days.",
+    "water": "• Higher water intake correlates with better emotional stability.",
+    "exercise": "• Consistent activity improves mood and energy levels.",
+    "pain": "• Monitor and manage pain; lower pain predicts a brighter mood.",
+    "energy": "• Higher energy levels are strongly linked to positive moods."
+}
+# Sign of the feature/mood correlation each directional message above asserts; sleep's message
+# names the better-mood level, so it fits either sign.
+MSG_DIRECTION = {"water": 1, "exercise": 1, "pain": -1, "energy": 1}
+
+# Content-ID the report's inline chart is referenced by from the email HTML
+CHART_CID = "mood-chart@elder-mood-mirror"
+# One mood distribution row; %-formatting is CPython's cheapest interpolation for the per-mood loop
+SUMMARY_LI = "<li style='color:%s;'><b>%s</b>: %d (%.1f%%)</li>"
+# The report email is compiled once at import and rendered in one pass per report. Autoescaping
+# stays off: suggestions carry their own <b> markup.
+EMAIL_TEMPLATE = Template("""
+<html><body style="font-family: Arial, sans-serif; line-height: 1.6; background-color: #f4f7f6; padding: 20px;">
+    <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.15); padding: 20px;">
+        <h2 style="color: #00796b; border-bottom: 2px solid #e0f2f1; padding-bottom: 10px;">🧓 Weekly Mood Report for {{ username }}</h2>
+
+        <div style="background-color: #e0f7fa; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
+            <h3 style="color: #00796b; margin-top: 0;">🧠 AI Summary:</h3>
+            <p>{{ ai_summary }}</p>
+        </div>
+
+        <h3 style="color: #00796b;">📊 Mood Distribution:</h3>
+        <ul style="list-style: none; padding: 0;">{{ summary_html }}</ul>
+
+        <h3 style="color: #00796b;">💡 Detailed Suggestions:</h3>
+        <ul style="padding-left: 20px;">
+        {%- for text in suggestions -%}
+            <li>{{ text }}</li>
+        {%- endfor -%}
+        </ul>
+
+        <p style="text-align: center; margin-top: 25px;">
+            <img src="cid:{{ chart_cid }}" alt="Mood chart" style="max-width: 100%; height: auto;">
+        </p>
+
+        <div style="text-align: center; margin-top: 30px; font-size: 12px; color: #999;">
+            &mdash; Elder Mood Mirror &mdash;
+        </div>
+    </div>
+</body></html>
+""")
+
+def _smtp_connection():
+    """Returns the shared authenticated SMTP connection, reconnecting if it was dropped or has
+    reached SMTP_MAX_MESSAGES. Call with _smtp_lock held."""
+    global _smtp, _smtp_sent
+    if _smtp is not None:
+        if _smtp_sent < SMTP_MAX_MESSAGES:
+            try:
+                _smtp.noop()
+                return _smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        try:
+            _smtp.close()
+        except OSError:
+            pass
+        _smtp = None
+    server = smtplib.SMTP_SSL("smtp.gmail.com", 465, timeout=SMTP_TIMEOUT)
+    try:
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    _smtp, _smtp_sent = server, 0
+    return _smtp
 
-def send_email(to_email, subject, html_body, attachments):
-    """Sends an HTML email with optional attachments using environment variables."""
+def build_message(html_body, images):
+    """Builds the HTML report with each (content_id, filename, bytes) PNG embedded inline for
+    <img src="cid:..."> references, base64-encoding each one once.
+
+    The message is unaddressed; send_emails fills in the headers per recipient.
+    """
+    msg = EmailMessage()
+    msg.set_content(html_body, subtype="html")
+    for cid, filename, data in images:
+        msg.add_related(data, maintype="image", subtype="png", cid=f"<{cid}>", filename=filename,
+                        disposition="inline")
+    return msg
+
+def send_emails(recipients, msg):
+    """Sends a message built by build_message to each (address, subject) recipient in one session
+    on the shared SMTP connection, so a report costs at most one NOOP check or login."""
+    global _smtp, _smtp_sent
     if not EMAIL_SENDER or not EMAIL_PASSWORD:
-        print("ERROR: Email credentials (EMAIL_SENDER/EMAIL_PASSWORD) not set in environment variables.")
+        logger.error("Email credentials (EMAIL_SENDER/EMAIL_PASSWORD) not set in environment variables.")
         # Raise an exception or return False if credentials are missing
         raise ValueError("Email credentials not configured.")
-        
-    msg = MIMEMultipart()
-    msg["From"] = EMAIL_SENDER
-    msg["To"] = to_email
-    msg["Subject"] = subject
-    msg.attach(MIMEText(html_body, "html"))
-    
-    for file_path in attachments:
-        try:
-            with open(file_path, "rb") as f:
-                part = MIMEApplication(f.read(), Name=os.path.basename(file_path))
-            part["Content-Disposition"] = f'attachment; filename="{os.path.basename(file_path)}"'
-            msg.attach(part)
-        except FileNotFoundError:
-            print(f"Warning: Attachment file not found at {file_path}")
-            continue
-            
+
     try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
+        with _smtp_lock:
+            server = _smtp_connection()
+            for to_email, subject in recipients:
+                for header, value in (("From", EMAIL_SENDER), ("To", to_email), ("Subject", subject)):
+                    del msg[header]
+                    msg[header] = value
+                try:
+                    server.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # The server dropped the session; reconnect and retry this recipient once
+                    server.close()
+                    _smtp = None
+                    server = _smtp_connection()
+                    server.send_message(msg)
+                _smtp_sent += 1
     except smtplib.SMTPAuthenticationError:
-        print("ERROR: SMTP Authentication Failed. Check App Password (EMAIL_PASSWORD).")
-        raise # Re-raise to be caught by the /analyze route's main error handler
+        logger.error("SMTP Authentication Failed. Check App Password (EMAIL_PASSWORD).")
+        raise # Re-raise so the job fails and /analyze/status reports it
     except Exception as e:
-        print(f"ERROR during email sending: {e}")
-        raise # Re-raise to be caught by the /analyze route's main error handler
+        logger.error("Error during email sending: %s", e)
+        raise # Re-raise so the job fails and /analyze/status reports it
 
 
+@functools.lru_cache(maxsize=None)
+def _openai_client():
+    """Creates the OpenAI client on first use; importing openai alone takes ~0.5 s of worker startup."""
+    from openai import OpenAI
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+@functools.lru_cache(maxsize=256)
+def _complete(prompt):
+    """Streams the chat completion for prompt and returns its text.
+
+    Identical prompts (same person, same week of data) are answered from the cache; failed
+    calls raise, so they are never cached.
+    """
+    stream = _openai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are an empathetic elder-care assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=180,  # ~150 words
+        temperature=0.8,
+        stream=True
+    )
+    return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices).strip()
+
 def generate_summary_with_ai(username, mood_counts, dominant_mood, suggestions):
     """Generate a summarized, empathetic mood report using Generative AI."""
     try:
-        if not client.api_key:
+        if not OPENAI_API_KEY:
              return "(AI summary unavailable: OPENAI_API_KEY not set)"
 
         prompt = f"""
         You are a compassionate AI health assistant summarizing mood data for an elder care report.
 
         Elder's Name: {username}
-        Mood distribution: {json.dumps(mood_counts, indent=2)}
+        Mood distribution: {orjson.dumps(mood_counts, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()}
         Dominant mood: {dominant_mood}
-        Observations and suggestions: {json.dumps(suggestions, indent=2)}
+        Observations and suggestions: {orjson.dumps(suggestions, option=orjson.OPT_INDENT_2).decode()}
 
         Please write a warm, concise summary (in about 100-150 words) that:
         - Summarizes how the elder has been feeling.
@@ -73,172 +254,327 @@ def generate_summary_with_ai(username, mood_counts, dominant_mood, suggestions):
         - Gives 2–3 actionable recommendations for their caregiver.
         - Keeps the tone supportive and easy to understand.
         """
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are an empathetic elder-care assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=250,
-            temperature=0.8
-        )
-        return response.choices[0].message.content.strip()
+        return _complete(prompt)
     except Exception as e:
-        print(f"OPENAI API Error: {e}") 
+        logger.error("OpenAI API Error: %s", e)
         return f"(AI summary unavailable due to API error.)"
 
-@app.route("/analyze", methods=["POST"])
-def analyze():
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({"status": "error", "message": "No JSON body"}), 400
+@functools.lru_cache(maxsize=None)
+def _chart_canvas():
+    """Builds the Agg figure reused for every chart, importing matplotlib on first use."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(9, 5), dpi=120)  # email clients downscale anyway
+    # Fixed margins fit the title, tick labels and "Count" label, so no per-render tight_layout() pass
+    fig.subplots_adjust(left=0.09, right=0.98, bottom=0.08, top=0.9)
+    return fig, fig.add_subplot(111), FigureCanvasAgg(fig)
 
-        survey_logs = data.get("daily_logs", [])
-        camera_logs = data.get("camera_moods", [])
-        all_logs = survey_logs + camera_logs
-        if not all_logs:
-            return jsonify({"status": "error", "message": "No mood data"}), 400
-
-        email = data.get("guardian_email", "")
-        clinic_email = data.get("clinic_email", "")
-        username = data.get("user_name", "Your loved one")
-
-        df_all = pd.DataFrame(all_logs)
-        if "mood" not in df_all.columns:
-            return jsonify({"status": "error", "message": "Missing mood column"}), 400
-
-        # Mood statistics (all logs)
-        mood_counts = Counter(df_all["mood"])
-        total_moods = sum(mood_counts.values())
-        percentages = {m: (c / total_moods) * 100 for m, c in mood_counts.items()}
-        dominant_mood = max(mood_counts, key=mood_counts.get)
-
-        # Prepare survey-only dataframe for clustering (requires full features)
-        feature_cols = ["sleep", "water", "exercise", "pain", "energy", "mood"]
-        df_survey = pd.DataFrame(survey_logs)
-        do_cluster = all(col in df_survey.columns for col in feature_cols) and not df_survey.empty
-
-        suggestions = []
-        if do_cluster:
-            # Clustering logic
-            df_survey_feat = df_survey[feature_cols].copy() 
-            encoders = {}
-            for col in df_survey_feat.columns:
-                le = LabelEncoder()
-                df_survey_feat[col] = le.fit_transform(df_survey_feat[col].astype(str))
-                encoders[col] = le
-
-            df_feat = df_survey_feat.drop(columns=["mood"])
-            
+def _trim_oldest(directory, suffix, keep):
+    """Deletes all but the `keep` most recently modified files in directory ending in suffix.
+
+    Best effort: other gunicorn workers may be trimming the same directory, and a failure here
+    is logged rather than failing the report that triggered it.
+    """
+    try:
+        entries = [e for e in os.scandir(directory) if e.name.endswith(suffix)]
+        if len(entries) <= keep:
+            return
+        files = []
+        for entry in entries:
             try:
-                kmeans = KMeans(n_clusters=2, random_state=42, n_init=10)
-                df_survey_feat["cluster"] = kmeans.fit_predict(df_feat)
-                df_survey_feat["mood_lbl"] = df_survey_feat["mood"]
-                cluster_mean = df_survey_feat.groupby("cluster").mean()
-                bad, good = sorted(cluster_mean.index, key=lambda i: cluster_mean.loc[i]["mood_lbl"])
-
-                for col in df_feat.columns:
-                    bad_v = cluster_mean.loc[bad][col]
-                    good_v = cluster_mean.loc[good][col]
-                    if abs(good_v - bad_v) >= 0.5:
-                        try:
-                            to_v = encoders[col].inverse_transform([int(round(good_v))])[0]
-                        except ValueError:
-                            to_v = "Optimal Level"
-                            
-                        msg_map = {
-                            "sleep": f"• They feel better on <b>{to_v.lower()}</b> sleep days.",
-                            "water": "• Higher water intake correlates with better emotional stability.",
-                            "exercise": "• Consistent activity improves mood and energy levels.",
-                            "pain": "• Monitor and manage pain; lower pain predicts a brighter mood.",
-                            "energy": "• Higher energy levels are strongly linked to positive moods."
-                        }
-                        suggestions.append(msg_map.get(col, f"• Improving <b>{col}</b> may help."))
-            except Exception as e:
-                print(f"Clustering Analysis Error: {e}")
-                suggestions.append("• Behavioral analysis failed due to data complexity.")
-
-
-        if not suggestions:
-            suggestions.append("• No immediate behavioral factors correlated with mood swings this week. Continue with current routines.")
-
-        # Mood chart generation
+                files.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass  # removed by another worker since the scan
+        files.sort(reverse=True)
+        for _, path in files[keep:]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another worker got there first
+    except FileNotFoundError:
+        return
+    except OSError as e:
+        logger.warning("Could not trim %s: %s", directory, e)
+
+def chart_path_for(username, mood_counts, dominant_mood):
+    """Returns the chart file for these inputs; the chart is a pure function of them, so identical reports share one PNG."""
+    key = hashlib.blake2b(f"{list(mood_counts.items())}|{dominant_mood}|{username}".encode(),
+                          digest_size=16).hexdigest()
+    return f"output/chart_{key}.png"
+
+def render_chart(chart_path, username, mood_counts, percentages, dominant_mood):
+    """Returns the mood bar chart as PNG bytes, rendering it in memory and saving it to chart_path
+    unless a chart for the same inputs is already there."""
+    from PIL import Image
+
+    with _chart_lock:
+        try:
+            with open(chart_path, "rb") as f:
+                png = f.read()
+            os.utime(chart_path)  # mark as recently used for _trim_oldest
+            return png
+        except FileNotFoundError:
+            pass
         os.makedirs("output", exist_ok=True)
-        fig, ax = plt.subplots(figsize=(9, 5))
-        
-        mood_colors = {
-            'Happy': '#4CAF50', 'Calm': '#2196F3', 'Anxious': '#FF9800', 
-            'Neutral': '#9E9E9E', 'Sad': '#F44336'
-        }
-        bar_colors = [mood_colors.get(m, '#607D8B') for m in mood_counts.keys()]
-
-        bars = ax.bar(mood_counts.keys(), mood_counts.values(), color=bar_colors, edgecolor="black")
-        
-        if dominant_mood in mood_counts:
-            dominant_idx = list(mood_counts.keys()).index(dominant_mood)
-            bars[dominant_idx].set_color('#ff8c42') 
-            bars[dominant_idx].set_edgecolor('red')
-
-        for idx, bar in enumerate(bars):
-            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.3,
-                    f"{percentages[list(mood_counts.keys())[idx]]:.1f}%",
+        fig, ax, canvas = _chart_canvas()
+        ax.clear()
+
+        # Per-bar names, counts, colours and labels are built once, aligned in the Counter's insertion
+        # order. The dominant mood is highlighted in orange with a red edge.
+        mood_names = list(mood_counts)
+        mood_values = [mood_counts[m] for m in mood_names]
+        bar_colors = [MOOD_COLOR.get(m, DEFAULT_COLOR) for m in mood_names]
+        edge_colors = ['black'] * len(mood_names)
+        dominant_idx = mood_names.index(dominant_mood)
+        bar_colors[dominant_idx], edge_colors[dominant_idx] = '#ff8c42', 'red'
+        pct_labels = [f"{percentages[m]:.1f}%" for m in mood_names]
+
+        bars = ax.bar(mood_names, mood_values, color=bar_colors, edgecolor=edge_colors)
+
+        for bar, label in zip(bars, pct_labels):
+            ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 0.3, label,
                     ha="center", va="bottom", fontsize=11, fontweight="bold")
         ax.set_title(f"🧠 Mood Trend for {username}", fontsize=18, color="teal")
         ax.set_ylabel("Count")
-        ax.set_ylim(0, max(mood_counts.values()) + 2)
-        sns.despine()
+        ax.set_ylim(0, max(mood_values) + 2)
+        ax.spines[["top", "right"]].set_visible(False)
         ax.grid(axis="y", linestyle="--", alpha=0.3)
-        chart_path = "output/mood_chart.png"
-        plt.tight_layout()
-        plt.savefig(chart_path, dpi=300)
-        plt.close()
-        
-        # Generate AI Summary
-        ai_summary = generate_summary_with_ai(username, mood_counts, dominant_mood, suggestions)
-
-        # Email body
-        summary_html = "".join(f"<li style='color:{mood_colors.get(m, '#000')};'><b>{m}</b>: {mood_counts[m]} ({percentages[m]:.1f}%)</li>" for m in mood_counts)
-        sug_html = "".join(f"<li>{s}</li>" for s in suggestions)
-        
-        email_body = f"""
-        <html><body style="font-family: Arial, sans-serif; line-height: 1.6; background-color: #f4f7f6; padding: 20px;">
-            <div style="max-width: 600px; margin: 0 auto; background-color: #ffffff; border-radius: 12px; box-shadow: 0 4px 12px rgba(0,0,0,0.15); padding: 20px;">
-                <h2 style="color: #00796b; border-bottom: 2px solid #e0f2f1; padding-bottom: 10px;">🧓 Weekly Mood Report for {username}</h2>
-                
-                <div style="background-color: #e0f7fa; padding: 15px; border-radius: 8px; margin-bottom: 20px;">
-                    <h3 style="color: #00796b; margin-top: 0;">🧠 AI Summary:</h3>
-                    <p>{ai_summary}</p>
-                </div>
-
-                <h3 style="color: #00796b;">📊 Mood Distribution:</h3>
-                <ul style="list-style: none; padding: 0;">{summary_html}</ul>
-
-                <h3 style="color: #00796b;">💡 Detailed Suggestions:</h3>
-                <ul style="padding-left: 20px;">{sug_html}</ul>
-                
-                <p style="text-align: center; margin-top: 25px; font-style: italic; color: #666;">
-                    See attached chart for visual trends.
-                </p>
-
-                <div style="text-align: center; margin-top: 30px; font-size: 12px; color: #999;">
-                    &mdash; Elder Mood Mirror &mdash;
-                </div>
-            </div>
-        </body></html>
-        """
+        # The chart only has a handful of flat colours, so a 64-colour palette PNG is ~4x smaller
+        # than matplotlib's RGBA output with no visible loss, which shrinks every email it goes in.
+        # The PNG is encoded in memory for the email; the cached copy is written to a temp file then
+        # renamed so a cache hit never sees a half-written file. _chart_lock is per process, so the
+        # temp name is unique to keep gunicorn workers rendering the same chart apart.
+        canvas.draw()
+        image = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba())
+        buf = io.BytesIO()
+        image.convert("RGB").quantize(64).save(buf, "png", optimize=True)
+        png = buf.getvalue()
+        tmp_path = f"{chart_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, chart_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+    _trim_oldest("output", ".png", MAX_CACHED_CHARTS)
+    return png
+
+
+def kmeans2(X, n_init=3, iters=20, seed=42, batch_size=256):
+    """Two-cluster Lloyd's k-means for the small (n, d) survey matrix; returns the label per row.
+
+    Like MiniBatchKMeans, centroids are fitted on at most batch_size sampled rows and every
+    row is then assigned once, so large payloads don't pay for full passes on each iteration.
+    """
+    import numpy as np
+    X = np.ascontiguousarray(X, dtype=np.float32)  # no-op for the matrix built in behavioral_suggestions()
+    rng = np.random.default_rng(seed)
+    batch = X if len(X) <= batch_size else X[rng.choice(len(X), batch_size, replace=False)]
+    best_centroids, best_inertia = None, np.inf
+    for _ in range(n_init):
+        centroids = batch[rng.choice(len(batch), 2, replace=False)]
+        for _ in range(iters):
+            dists = ((batch[:, None, :] - centroids) ** 2).sum(-1)
+            labels = dists.argmin(1)
+            # Per-cluster sums via one (2, b) @ (b, d) product instead of copying each cluster's rows
+            onehot = (labels == np.arange(2)[:, None]).astype(np.float32)
+            counts = onehot.sum(1, keepdims=True)
+            new_centroids = np.where(counts > 0, onehot @ batch / np.maximum(counts, 1), centroids)
+            if np.allclose(centroids, new_centroids):
+                break
+            centroids = new_centroids
+        inertia = dists.min(1).sum()
+        if inertia < best_inertia:
+            best_centroids, best_inertia = centroids, inertia
+    return ((X[:, None, :] - best_centroids) ** 2).sum(-1).argmin(1)
+
+def behavioral_suggestions(survey_logs):
+    """Clusters the survey logs and suggests the habits that separate better-mood days from worse ones."""
+    # Clustering needs the full feature set on every survey log
+    do_cluster = bool(survey_logs) and all(
+        all(col in r for col in FEATURE_COLS) and "mood" in r for r in survey_logs)
+
+    suggestions = []
+    if do_cluster:
+        # Imported on first use rather than at module load, which keeps it off worker boot time;
+        # the first chart render (matplotlib) would import it anyway
+        import numpy as np
+        # Encode each feature as its index in the sorted list of observed levels, filling a
+        # C-contiguous float32 matrix column by column. One np.unique call per column factorizes
+        # it in C: numeric columns are ranked by value, categorical ones by their str() form.
+        n = len(survey_logs)
+        X = np.empty((n, len(FEATURE_COLS)), dtype=np.float32, order="C")
+        levels = {}
+        # Correlation sign a feature needs for its message: 0 when any sign fits, NaN when none can
+        # be trusted (categorical codes are alphabetical, so their order says nothing)
+        required_sign = np.zeros(len(FEATURE_COLS))
+        for j, col in enumerate(FEATURE_COLS):
+            raw = [r[col] for r in survey_logs]
+            numeric = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in raw)
+            values = np.asarray(raw, dtype=np.float32) if numeric else np.array([str(v) for v in raw])
+            uniques, X[:, j] = np.unique(values, return_inverse=True)
+            levels[col] = [f"{u:g}" for u in uniques] if numeric else uniques.tolist()
+            if col in MSG_DIRECTION:
+                required_sign[j] = MSG_DIRECTION[col] if numeric else np.nan
+        y = np.fromiter((MOOD_ENC.get(r["mood"], MOOD_ENC["Neutral"]) for r in survey_logs),
+                        dtype=np.int8, count=n)
+
+        try:
+            if n >= MIN_CLUSTER_ROWS:
+                mask0 = kmeans2(X) == 0
+                if mask0.all() or not mask0.any():
+                    raise ValueError("survey logs did not split into two clusters")
+                onehot = np.stack([mask0, ~mask0]).astype(np.float32)
+                means = onehot @ X / onehot.sum(1, keepdims=True)
+                bad, good = (0, 1) if y[mask0].mean() <= y[~mask0].mean() else (1, 0)
+                effect, threshold = means[good] - means[bad], 0.5
+                good_levels = means[good]
+            else:
+                # Cluster means over a handful of days are noise; correlate each feature with mood
+                # instead. Constant columns give NaN, which never passes the threshold.
+                corr = np.full(len(FEATURE_COLS), np.nan)
+                if n > 2:
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        corr = np.corrcoef(X, y, rowvar=False)[-1, :-1]
+                effect, threshold = corr, MIN_MOOD_CORRELATION
+                good_levels = X[y >= y.mean()].mean(0)  # typical levels on the better-mood days
+
+            # Only suggest a feature whose link to better moods points the way its message says
+            fits = (required_sign == 0) | (np.sign(effect) == required_sign)
+            significant = np.flatnonzero((np.abs(effect) >= threshold) & fits)
+
+            for j in significant:
+                col = FEATURE_COLS[j]
+                level = levels[col][int(round(good_levels[j]))]
+                suggestions.append(MSG_MAP[col].format(level=level.lower()))
+        except Exception as e:
+            logger.error("Clustering Analysis Error: %s", e)
+            suggestions.append("• Behavioral analysis failed due to data complexity.")
+
+    if not suggestions:
+        suggestions.append("• No immediate behavioral factors correlated with mood swings this week. Continue with current routines.")
+    return suggestions
+
+def run_analysis(survey_logs, mood_counts, username, email, clinic_email):
+    """Background job: builds the full report, emails it, and returns the result served by /analyze/status."""
+    # Mood statistics (all logs)
+    ranked_moods = mood_counts.most_common()  # (mood, count) pairs, most frequent first
+    inv_total = 100.0 / sum(mood_counts.values())
+    percentages = {m: c * inv_total for m, c in ranked_moods}
+    dominant_mood = ranked_moods[0][0]
+
+    suggestions = behavioral_suggestions(survey_logs)
+
+    # The chart renders while the AI summary request is in flight
+    chart_path = chart_path_for(username, mood_counts, dominant_mood)
+    chart_done = chart_executor.submit(render_chart, chart_path, username, mood_counts,
+                                       percentages, dominant_mood)
 
-        if email:
-            send_email(email, f"AI Mood Report for {username} 📊", email_body, [chart_path])
-        if clinic_email and "@" in clinic_email:
-            send_email(clinic_email, f"[Clinic] AI Report – {username}", email_body, [chart_path])
+    # Generate AI Summary
+    ai_summary = generate_summary_with_ai(username, mood_counts, dominant_mood, suggestions)
+    chart_png = chart_done.result()
 
-        return jsonify({"status": "success", "dominant_mood": dominant_mood,
-                        "suggestions": suggestions, "ai_summary": ai_summary, "mood_chart": "/output/mood_chart.png"}), 200
+    recipients = []
+    if email:
+        recipients.append((email, f"AI Mood Report for {username} 📊"))
+    if clinic_email and "@" in clinic_email:
+        recipients.append((clinic_email, f"[Clinic] AI Report – {username}"))
+
+    if recipients:
+        # Email body, with the chart shown inline; the PNG is encoded once for all recipients
+        summary_html = "".join([SUMMARY_LI % (MOOD_COLOR.get(m, '#000'), m, c, percentages[m])
+                                for m, c in ranked_moods])
+        email_body = EMAIL_TEMPLATE.render(username=username, ai_summary=ai_summary, summary_html=summary_html,
+                                           suggestions=suggestions, chart_cid=CHART_CID)
+        msg = build_message(email_body, [(CHART_CID, "mood_chart.png", chart_png)])
+        send_emails(recipients, msg)
+
+    return {"status": "success", "dominant_mood": dominant_mood,
+            "suggestions": suggestions, "ai_summary": ai_summary, "mood_chart": f"/{chart_path}"}
+
+def _write_job(task_id, payload):
+    """Stores a job's status document, replacing the previous one atomically."""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{task_id}.json")
+    with open(path + ".tmp", "wb") as f:
+        f.write(orjson.dumps(payload))
+    os.replace(path + ".tmp", path)
+
+def submit_job(fn, *args):
+    """Runs fn(*args) on the background pool and returns a task id to poll /analyze/status with."""
+    task_id = uuid.uuid4().hex
+    _write_job(task_id, {"status": "pending", "task_id": task_id, "submitted_at": time.time()})
+
+    def _finished(future):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error("Analysis job %s failed: %s", task_id, e)
+            result = {"status": "error", "message": str(e)}
+        _write_job(task_id, result)
+        # Trimming scans the whole job store, so it runs here on the pool, not on the request thread
+        _trim_oldest(JOBS_DIR, ".json", MAX_TRACKED_JOBS)
+
+    executor.submit(fn, *args).add_done_callback(_finished)
+    return task_id
+
+def json_response(payload, status=200):
+    """Serialises payload with orjson, which is several times faster than the stdlib json behind jsonify."""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype="application/json")
+
+@app.route("/analyze", methods=["POST"])
+def analyze():
+    try:
+        try:
+            data = orjson.loads(request.get_data(cache=False))
+        except orjson.JSONDecodeError:
+            data = None
+        if not data or not isinstance(data, dict):
+            return json_response({"status": "error", "message": "No JSON body"}, 400)
+
+        # Fields sent as null count as omitted
+        survey_logs, camera_logs, email, clinic_email, username = (
+            default if data.get(key) is None else data[key] for key, default in REQUEST_FIELDS.items())
+        if not all(isinstance(logs, list) and all(isinstance(r, dict) for r in logs)
+                   for logs in (survey_logs, camera_logs)):
+            return json_response({"status": "error", "message": "Mood logs must be lists of objects"}, 400)
+        if not all(isinstance(value, str) for value in (email, clinic_email, username)):
+            return json_response({"status": "error", "message": "Emails and user name must be strings"}, 400)
+        all_logs = survey_logs + camera_logs
+        if not all_logs:
+            return json_response({"status": "error", "message": "No mood data"}, 400)
+
+        # Counter tallies the generator in C without materialising a list of moods first
+        mood_counts = Counter(r["mood"] for r in all_logs if "mood" in r)
+        if not mood_counts:
+            return json_response({"status": "error", "message": "Missing mood column"}, 400)
+
+        # Clustering, the chart, the AI summary and SMTP all run on the pool; poll for the result
+        task_id = submit_job(run_analysis, survey_logs, mood_counts, username, email, clinic_email)
+        return json_response({"status": "accepted", "task_id": task_id,
+                              "status_url": f"/analyze/status/{task_id}"}, 202)
 
     except Exception as e:
-        print(f"An unexpected error occurred: {e}") 
-        return jsonify({"status": "error", "message": str(e)}), 500
+        logger.exception("An unexpected error occurred: %s", e)
+        return json_response({"status": "error", "message": str(e)}, 500)
+
+@app.route("/analyze/status/<task_id>", methods=["GET"])
+def analyze_status(task_id):
+    try:
+        # Task ids are uuid4 hex, so anything else (including path tricks) is simply unknown
+        with open(os.path.join(JOBS_DIR, f"{uuid.UUID(hex=task_id).hex}.json"), "rb") as f:
+            job = orjson.loads(f.read())
+    except (ValueError, FileNotFoundError):
+        return json_response({"status": "error", "message": "Unknown task id"}, 404)
+    if job["status"] == "pending" and time.time() - job.get("submitted_at", 0) > JOB_DEADLINE_SECONDS:
+        job = {"status": "error", "task_id": task_id, "message": "Job did not finish; it was lost with its worker"}
+    status_code = {"pending": 202, "error": 500}.get(job["status"], 200)
+    return json_response(job, status_code)
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Local development only; deploy with `gunicorn app:app` (gevent workers, see gunicorn.conf.py)
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1", host="0.0.0.0", port=5000, threaded=True)
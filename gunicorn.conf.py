@@ -0,0 +1,9 @@
+# Picked up automatically by `gunicorn app:app`.
+# gevent workers monkey-patch sockets before app.py is imported, so the SMTP and
+# OpenAI calls behind /analyze yield to other requests instead of pinning a worker.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "gevent"
+worker_connections = 1000